@@ -29,3 +29,149 @@ def enable_pg_trgm():
         connection.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm;"))
         connection.commit()
 
+
+def enable_full_text_search():
+    # Weighted tsvector over the event fields so names outrank descriptions:
+    # A = name, B = domain/speakers/collaboration, C = perks/coordinators,
+    # D = description. Generated + GIN indexed, so lexical search is an
+    # index scan instead of a sequential ILIKE.
+    with engine.connect() as connection:
+        if connection.execute(text("SELECT to_regclass('events')")).scalar() is None:
+            return
+        connection.execute(text("""
+            ALTER TABLE events
+            ADD COLUMN IF NOT EXISTS search_tsv tsvector
+            GENERATED ALWAYS AS (
+                setweight(to_tsvector('english', coalesce(NULLIF(name_of_event, 'NaN'), '')), 'A')
+                || setweight(to_tsvector('english',
+                    coalesce(NULLIF(event_domain, 'NaN'), '') || ' ' ||
+                    coalesce(NULLIF(speakers, 'NaN'), '') || ' ' ||
+                    coalesce(NULLIF(collaboration, 'NaN'), '')), 'B')
+                || setweight(to_tsvector('english',
+                    coalesce(NULLIF(perks, 'NaN'), '') || ' ' ||
+                    coalesce(NULLIF(faculty_coordinators, 'NaN'), '') || ' ' ||
+                    coalesce(NULLIF(student_coordinators, 'NaN'), '')), 'C')
+                || setweight(to_tsvector('english', coalesce(NULLIF(description_insights, 'NaN'), '')), 'D')
+            ) STORED;
+        """))
+        connection.execute(text(
+            "CREATE INDEX IF NOT EXISTS fts_idx_events_search_tsv "
+            "ON events USING GIN (search_tsv);"
+        ))
+        # Trigram index on the name with repeated letters collapsed (same as
+        # normalize_text), used for typo-tolerant name matching. The
+        # expression must match retriever.NAME_TRGM_EXPR.
+        connection.execute(text(r"""
+            CREATE INDEX IF NOT EXISTS trgm_idx_events_name
+            ON events
+            USING GIN ((regexp_replace(LOWER(name_of_event), '(.)\1+', '\1', 'g')) gin_trgm_ops);
+        """))
+        connection.commit()
+
+
+def enable_event_stats():
+    # Pre-aggregated event counts for "how many" / "per month" / "by domain"
+    # questions. event_stats counts each event once; event_domain_stats splits
+    # multi-valued domains ("AI / ML") so an event counts once per domain.
+    with engine.connect() as connection:
+        if connection.execute(text("SELECT to_regclass('events')")).scalar() is None:
+            return
+        connection.execute(text("""
+            CREATE MATERIALIZED VIEW IF NOT EXISTS event_stats AS
+            SELECT
+                EXTRACT(YEAR FROM date_of_event)::int AS year,
+                EXTRACT(MONTH FROM date_of_event)::int AS month,
+                initcap(mode_of_event) AS mode_of_event,
+                CASE WHEN registration_fee = 0 THEN 'Free' ELSE 'Paid' END AS fee_tier,
+                COUNT(*) AS event_count
+            FROM events
+            GROUP BY 1, 2, 3, 4;
+        """))
+        connection.execute(text("""
+            CREATE MATERIALIZED VIEW IF NOT EXISTS event_domain_stats AS
+            SELECT
+                EXTRACT(YEAR FROM date_of_event)::int AS year,
+                EXTRACT(MONTH FROM date_of_event)::int AS month,
+                trim(domain) AS event_domain,
+                initcap(mode_of_event) AS mode_of_event,
+                CASE WHEN registration_fee = 0 THEN 'Free' ELSE 'Paid' END AS fee_tier,
+                COUNT(*) AS event_count
+            FROM events, unnest(string_to_array(event_domain, '/')) AS domain
+            WHERE trim(domain) NOT IN ('', 'NaN')
+            GROUP BY 1, 2, 3, 4, 5;
+        """))
+        connection.commit()
+
+
+
+def enable_event_versioning():
+    # Single-row write counter bumped by a statement-level trigger on events,
+    # so the browse API can build ETag / Last-Modified without scanning rows.
+    with engine.connect() as connection:
+        if connection.execute(text("SELECT to_regclass('events')")).scalar() is None:
+            return
+        connection.execute(text("""
+            CREATE TABLE IF NOT EXISTS events_version (
+                id INTEGER PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+                version BIGINT NOT NULL DEFAULT 1,
+                updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+            );
+        """))
+        connection.execute(text(
+            "INSERT INTO events_version (id) VALUES (1) ON CONFLICT (id) DO NOTHING;"
+        ))
+        # Keyset index for browsing newest first; the expression must match
+        # the sort key in retriever.search_events.
+        connection.execute(text("""
+            CREATE INDEX IF NOT EXISTS idx_events_browse
+            ON events ((COALESCE(date_of_event, DATE '0001-01-01')), serial_no);
+        """))
+        connection.execute(text("""
+            CREATE OR REPLACE FUNCTION bump_events_version()
+            RETURNS TRIGGER AS $$
+            BEGIN
+                UPDATE events_version
+                SET version = version + 1, updated_at = clock_timestamp()
+                WHERE id = 1;
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql;
+        """))
+        # Only create the trigger when missing: CREATE/DROP TRIGGER lock the
+        # events table exclusively, and concurrent startups may race here.
+        connection.execute(text("""
+            DO $$
+            BEGIN
+                IF NOT EXISTS (
+                    SELECT 1 FROM pg_trigger
+                    WHERE tgname = 'events_version_trigger'
+                      AND tgrelid = 'events'::regclass
+                ) THEN
+                    CREATE TRIGGER events_version_trigger
+                    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON events
+                    FOR EACH STATEMENT EXECUTE FUNCTION bump_events_version();
+                END IF;
+            EXCEPTION WHEN duplicate_object THEN
+                NULL;
+            END;
+            $$;
+        """))
+        connection.commit()
+
+
+def enable_chat_sessions():
+    # Shared conversation state for multi-worker serving (see sessions.py).
+    # UNLOGGED: sessions are disposable, so skip WAL for cheaper writes.
+    with engine.connect() as connection:
+        connection.execute(text("""
+            CREATE UNLOGGED TABLE IF NOT EXISTS chat_sessions (
+                session_id TEXT PRIMARY KEY,
+                payload JSONB NOT NULL,
+                last_access TIMESTAMPTZ NOT NULL DEFAULT now()
+            );
+        """))
+        connection.execute(text(
+            "CREATE INDEX IF NOT EXISTS idx_chat_sessions_last_access "
+            "ON chat_sessions (last_access);"
+        ))
+        connection.commit()
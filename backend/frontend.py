@@ -1,14 +1,9 @@
 import os
-import threading
 import traceback
 import psycopg2
 from pgvector.psycopg2 import register_vector
-from sentence_transformers import SentenceTransformer
 
-# --- Config ---
-_MODEL = None
-_MODEL_LOCK = threading.Lock()
-MODEL_NAME = "BAAI/bge-base-en-v1.5"
+import retriever
 
 def _get_db_connection():
     try:
@@ -20,13 +15,9 @@ def _get_db_connection():
         return None
 
 def _load_model():
-    global _MODEL
-    if _MODEL: return _MODEL
-    with _MODEL_LOCK:
-        if not _MODEL:
-            print(f"[frontend] Loading model '{MODEL_NAME}'...")
-            _MODEL = SentenceTransformer(MODEL_NAME, trust_remote_code=True)
-    return _MODEL
+    # Reuse the retriever's model rather than loading a second copy of
+    # the same weights; under gunicorn it is shared copy-on-write.
+    return retriever.model
 
 def add_new_event(form_data):
     conn = _get_db_connection()
@@ -99,6 +90,10 @@ def add_new_event(form_data):
 
             cur.execute(sql, params)
 
+            # Keep the count/calendar aggregates in step with the new row
+            cur.execute("REFRESH MATERIALIZED VIEW event_stats")
+            cur.execute("REFRESH MATERIALIZED VIEW event_domain_stats")
+
         conn.commit()
         return {"status": "success", "message": "Event saved successfully."}
 
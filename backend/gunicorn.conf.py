@@ -0,0 +1,38 @@
+# backend/gunicorn.conf.py
+#
+# Multi-worker serving: gunicorn -c gunicorn.conf.py main:app
+#
+# The app is imported once in the master (preload_app), so the
+# SentenceTransformer weights and the startup DDL happen a single time and
+# workers share the model pages copy-on-write after fork. Conversation
+# sessions move to the shared chat_sessions table so follow-ups work no
+# matter which worker serves them.
+import gc
+import multiprocessing
+import os
+
+os.environ.setdefault("SESSION_BACKEND", "postgres")
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = 120
+
+
+def when_ready(server):
+    # Move everything loaded so far into the permanent generation so the
+    # workers' garbage collector doesn't touch (and copy) the shared pages.
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # Connections opened by the master during startup must not be reused
+    # across processes; drop them without closing the master's sockets.
+    from database import engine
+    engine.dispose(close=False)
+
+    # Split the cores between workers instead of every worker running
+    # torch with one thread per core.
+    import torch
+    torch.set_num_threads(max(1, multiprocessing.cpu_count() // server.cfg.workers))
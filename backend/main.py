@@ -1,7 +1,9 @@
 import hashlib
+from datetime import date, timezone
+from email.utils import format_datetime, parsedate_to_datetime
 from typing import Optional
 
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel, root_validator
@@ -17,7 +19,9 @@ load_dotenv()
 
 # Your existing logic
 import query_pipeline
+import retriever
 import frontend  # python module, not nextjs
+import sessions
 
 from config import SECRET_KEY, ALGORITHM
 
@@ -75,6 +79,7 @@ def create_default_user():
 # Data Models
 class ChatRequest(BaseModel):
     query: str
+    session_id: Optional[str] = None
 
 class EventData(BaseModel):
     name_of_event: str
@@ -110,9 +115,11 @@ def health_check():
 def chat_endpoint(request: ChatRequest):
     try:
         print("Incoming query:", request.query)
-        response = query_pipeline.handle_user_query(request.query)
+        session = sessions.store.get_or_create(request.session_id)
+        response = query_pipeline.handle_user_query(request.query, session)
+        sessions.store.save(session)
         print("Agent response generated")
-        return {"answer": response}
+        return {"answer": response, "session_id": session.session_id}
 
     except Exception as e:
         import traceback
@@ -120,6 +127,79 @@ def chat_endpoint(request: ChatRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def is_not_modified(request: Request, etag: str, last_modified) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        tags = [t.strip() for t in if_none_match.split(",")]
+        return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        # A "-0000" zone parses as naive; HTTP dates are always UTC
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return last_modified.replace(microsecond=0) <= since
+    return False
+
+@app.get("/api/events")
+def events_endpoint(
+    request: Request,
+    response: Response,
+    q: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    domain: Optional[str] = None,
+    max_fee: Optional[int] = Query(None, ge=0),
+    free: bool = False,
+    mode: Optional[str] = None,
+    fields: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+):
+    # Browse/search without the LLM. Responses are revalidated against the
+    # events_version counter, so unchanged pages cost one tiny lookup.
+    try:
+        version, updated_at = retriever.get_events_version()
+    except Exception as e:
+        print("EVENTS VERSION ERROR:", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+    etag = '"' + hashlib.sha256(
+        f"{version}?{request.url.query}".encode()
+    ).hexdigest()[:32] + '"'
+    last_modified = updated_at.astimezone(timezone.utc) if updated_at else None
+    headers = {"ETag": etag, "Cache-Control": "public, no-cache"}
+    if last_modified:
+        headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+
+    if is_not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+
+    try:
+        rows, next_cursor = retriever.search_events(
+            query=q,
+            date_from=date_from,
+            date_to=date_to,
+            domain=domain,
+            max_fee=0 if free else max_fee,
+            mode=mode,
+            fields=tuple(f.strip() for f in fields.split(",") if f.strip()) if fields else None,
+            limit=limit,
+            cursor=cursor,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print("EVENTS SEARCH ERROR:", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+    response.headers.update(headers)
+    return {"events": rows, "next_cursor": next_cursor}
+
 @app.post("/api/add-event")
 def add_event_endpoint(
     event: EventData,
@@ -139,10 +219,22 @@ def verify_token_endpoint(_: dict = Depends(verify_token)):
 
 
 # Startup
-from database import enable_pg_trgm
+from database import (
+    enable_pg_trgm,
+    enable_full_text_search,
+    enable_event_stats,
+    enable_event_versioning,
+    enable_chat_sessions,
+)
 enable_pg_trgm()
+enable_full_text_search()
+enable_event_stats()
+enable_event_versioning()
+enable_chat_sessions()
 Base.metadata.create_all(bind=engine)
 create_default_user()
 
 # Run with:
 # uvicorn main:app --reload
+# or, multi-worker with a shared preloaded model:
+# gunicorn -c gunicorn.conf.py main:app
@@ -26,16 +26,141 @@ def extract_year(text):
     m = re.search(r"(19|20)\d{2}", text)
     return int(m.group()) if m else None
 
+MONTH_NAMES = [
+    "january", "february", "march", "april", "may", "june",
+    "july", "august", "september", "october", "november", "december"
+]
+
 def extract_month(text):
-    month_map = {
-        "january": 1, "february": 2, "march": 3, "april": 4,
-        "may": 5, "june": 6, "july": 7, "august": 8,
-        "september": 9, "october": 10, "november": 11, "december": 12
+    # Only month names used as dates ("in may", "march 2025"), so words like
+    # "may I" or "march on" don't become filters
+    months = "|".join(MONTH_NAMES)
+    m = re.search(
+        rf"\b(?:in|during|of|for|from|since|before|after) ({months})\b"
+        rf"|\b({months})(?: \d{{1,2}})?,? (?:19|20)\d{{2}}\b",
+        text,
+    )
+    if not m:
+        return None
+    return MONTH_NAMES.index(m.group(1) or m.group(2)) + 1
+
+def extract_aggregate_intent(text):
+    """
+    Detect count / calendar questions ("how many events in 2024", "which
+    domains had the most events", "free events per month") and map them to
+    group-by dimensions and filters for retriever.get_event_counts.
+    Expects the raw lowercased question, since normalize_text collapses
+    repeated letters ("free" -> "fre").
+    """
+    # Grouping / counting phrases must be tied to "events" so factual
+    # questions ("which year was X held?", "total fee for Y") don't match
+    group_by = []
+    if re.search(r"\bevents (?:\w+ ){0,3}?(per|by|each|every|a) year\b|\byearly events\b", text):
+        group_by.append("year")
+    if re.search(r"\bevents (?:\w+ ){0,3}?(per|by|each|every|a) month\b|\bmonthly events\b", text):
+        group_by += ["year", "month"] if "year" not in group_by else ["month"]
+    if re.search(
+        r"\bevents (?:\w+ ){0,3}?(per|by|each|for each|in each) domain\b"
+        r"|\bdomains? (?:\w+ ){0,3}?(most|fewest|least|more|fewer) events\b",
+        text,
+    ):
+        group_by.append("event_domain")
+    if re.search(
+        r"\bevents (?:\w+ ){0,3}?(per|by|each) mode\b|\bonline (vs|versus|or|and) offline events\b",
+        text,
+    ):
+        group_by.append("mode_of_event")
+
+    count_phrase = r"\b(how many|number of|count of|count the) "
+    if not group_by and not re.search(count_phrase + r".*\bevents\b", text):
+        return None
+
+    domains = retriever_module.get_event_domains()
+
+    # Only adjectives may sit between the count phrase and "events"
+    # ("how many free online events"), not "how many people attended the events"
+    adjectives = "|".join(
+        re.escape(w) for w in ["free", "paid", "online", "offline", *(d.lower() for d in domains)]
+    )
+    is_count = re.search(count_phrase + rf"(?:(?:{adjectives}) ){{0,3}}events\b", text)
+    if not group_by and not is_count:
+        return None
+
+    filters = {}
+    year = extract_year(text)
+    month = extract_month(text)
+    if year:
+        filters["year"] = year
+    if month:
+        filters["month"] = month
+    if re.search(r"\bfree\b", text):
+        filters["fee_tier"] = "Free"
+    elif re.search(r"\bpaid\b", text):
+        filters["fee_tier"] = "Paid"
+    if "mode_of_event" not in group_by:
+        if re.search(r"\bonline\b", text):
+            filters["mode_of_event"] = "Online"
+        elif re.search(r"\boffline\b", text):
+            filters["mode_of_event"] = "Offline"
+    if "event_domain" not in group_by:
+        # A domain is a filter only next to "events" / "domain", so ordinary
+        # words that are also domains ("in general") don't match
+        for domain in sorted(domains, key=len, reverse=True):
+            d = re.escape(domain.lower())
+            if re.search(rf"\b{d} (?:domain )?events\b|\b{d} domain\b", text):
+                filters["event_domain"] = domain
+                break
+
+    return {"group_by": tuple(group_by), "filters": filters}
+
+def format_event_counts(intent, rows):
+    filters = intent["filters"]
+    scope = []
+    if "fee_tier" in filters:
+        scope.append(filters["fee_tier"].lower())
+    if "mode_of_event" in filters:
+        scope.append(filters["mode_of_event"].lower())
+    if "event_domain" in filters:
+        scope.append(filters["event_domain"])
+    scope.append("events")
+    if "month" in filters:
+        scope.append(f"in {MONTH_NAMES[filters['month'] - 1].title()}")
+        if "year" in filters:
+            scope.append(str(filters["year"]))
+    elif "year" in filters:
+        scope.append(f"in {filters['year']}")
+    scope = " ".join(scope)
+
+    group_by = intent["group_by"]
+    if not group_by:
+        total = rows[0]["event_count"] if rows else 0
+        return f"There were **{total}** {scope}."
+
+    if not rows:
+        return f"There were no {scope}."
+
+    labels = {
+        "year": "Year",
+        "month": "Month",
+        "event_domain": "Domain",
+        "mode_of_event": "Mode",
+        "fee_tier": "Fee",
     }
-    for name, num in month_map.items():
-        if name in text:
-            return num
-    return None
+    lines = [
+        f"**{scope[0].upper() + scope[1:]}:**",
+        "",
+        "| " + " | ".join(labels[d] for d in group_by) + " | Events |",
+        "|" + "---|" * (len(group_by) + 1),
+    ]
+    for row in rows:
+        cells = []
+        for d in group_by:
+            value = row[d]
+            if d == "month" and value:
+                value = MONTH_NAMES[value - 1].title()
+            cells.append(str(value if value is not None else "N/A"))
+        lines.append("| " + " | ".join(cells) + f" | {row['event_count']} |")
+    return "\n".join(lines)
 
 def extract_event_name(text):
     patterns = [
@@ -60,7 +185,110 @@ def extract_keywords(text: str) -> str:
     keywords = [w for w in words if w not in stop_words]
     return " ".join(keywords)
 
-def gemini_answer(question, context):
+EVENT_FIELDS = [
+    ("date_of_event","Date"),
+    ("time_of_event","Time"),
+    ("venue","Venue"),
+    ("mode_of_event","Mode"),
+    ("registration_fee","Registration Fee"),
+    ("speakers","Speakers"),
+    ("faculty_coordinators","Faculty Coordinators"),
+    ("student_coordinators","Student Coordinators"),
+    ("perks","Perks"),
+    ("collaboration","Collaboration"),
+    ("description_insights","Description")
+]
+
+ORDINALS = {
+    "first": 1, "1st": 1, "second": 2, "2nd": 2, "third": 3, "3rd": 3,
+    "fourth": 4, "4th": 4, "fifth": 5, "5th": 5, "last": -1
+}
+
+# Words a follow-up may contain besides extract_keywords' stop words:
+# pronouns, auxiliaries and the event fields people ask about. Anything
+# else is new content and means the question needs a fresh retrieval.
+FOLLOW_UP_WORDS = {
+    "it", "its", "they", "them", "their", "these", "those", "that", "this",
+    "one", "ones", "event", "was", "were", "are", "did", "does", "do", "has",
+    "have", "had", "will", "be", "been", "can", "which", "how", "much",
+    "many", "and", "or", "also", "there", "held", "happen", "happened",
+    "hosted", "located", "perks", "perk", "venue", "venues", "date", "dates",
+    "time", "timing", "fee", "fees", "free", "paid", "cost", "price",
+    "registration", "speakers", "speaker", "coordinators", "coordinator",
+    "faculty", "mode", "online", "offline", "collaboration", "description",
+    "more", "info", "information"
+}
+
+HISTORY_ANSWER_CHARS = 500
+
+def format_event(event, include_score=False):
+    details = [f"## {event.get('name_of_event','N/A')}"]
+    for k, label in EVENT_FIELDS:
+        if event.get(k) is not None:
+            details.append(f"**{label}:** {event[k]}")
+    if include_score and "final_score" in event:
+        details.append(f"**Relevance Score:** {event['final_score']:.4f}")
+    return "\n".join(details)
+
+def project_event(event):
+    # Keep only the display columns; get_event_by_name returns SELECT *,
+    # including the embedding and search_text
+    keys = ["name_of_event", *(k for k, _ in EVENT_FIELDS)]
+    return {k: event[k] for k in keys if k in event}
+
+def resolve_follow_up(text, session):
+    """
+    Match a follow-up ("the second one", "is it free?", "where were they
+    held?") against the session's cached event set. Returns the referenced
+    events, or None if the question needs a fresh retrieval.
+    Expects the raw lowercased question.
+    """
+    if session is None or not session.events:
+        return None
+    # A year means the question starts a new time-scoped search
+    if extract_year(text):
+        return None
+    events = session.events
+
+    ordinal = re.search(
+        r"\b(" + "|".join(ORDINALS) + r")(?: one\b| of them\b| of those\b| result\b)", text
+    )
+    number = re.search(r"(?:#|\bnumber |\bevent )(\d+)\b", text)
+    if ordinal or number:
+        index = ORDINALS[ordinal.group(1)] if ordinal else int(number.group(1))
+        if index == -1:
+            return [events[-1]]
+        if 1 <= index <= len(events):
+            return [events[index - 1]]
+        return None
+
+    q = normalize_text(text)
+    named = [
+        e for e in events
+        if len(e.get("name_of_event") or "") > 3
+        and normalize_text(e["name_of_event"]) in q
+    ]
+    if named:
+        return named
+
+    # Pronouns only refer back when the question brings nothing new of its
+    # own ("is it free?", "where were they held?")
+    if any(w not in FOLLOW_UP_WORDS for w in extract_keywords(text).split()):
+        return None
+    if session.focus and re.search(r"\b(it|its|that one|this one|that event|this event|the event)\b", text):
+        return [session.focus]
+    if re.search(r"\b(they|them|those|these|their)\b", text):
+        return events
+    return None
+
+def gemini_answer(question, context, history=None):
+    conversation = ""
+    if history:
+        turns = []
+        for past_question, past_answer in history:
+            turns.append(f"User: {past_question}\nAssistant: {past_answer[:HISTORY_ANSWER_CHARS]}")
+        conversation = "\nConversation so far:\n" + "\n\n".join(turns) + "\n"
+
     prompt = f"""
 You are a helpful university knowledge assistant.
 
@@ -68,7 +296,7 @@ Answer the question ONLY using the information provided.
 If information is insufficient, say so clearly.
 
 Use markdown formatting.
-
+{conversation}
 Question:
 {question}
 
@@ -80,9 +308,24 @@ Answer:
     response = llm.generate_content(prompt)
     return response.text.strip()
 
-def handle_user_query(question: str) -> str:
+def handle_user_query(question: str, session=None) -> str:
+    answer = answer_query(question, session)
+    if session is not None:
+        session.add_turn(question, answer)
+    return answer
+
+def answer_query(question: str, session=None) -> str:
     q = normalize_text(question)
 
+    # Follow-ups are answered from the session's cached events, skipping
+    # embedding and the database entirely
+    referenced = resolve_follow_up(question.lower(), session)
+    if referenced:
+        if len(referenced) == 1:
+            session.focus = referenced[0]
+        context = "\n\n---\n\n".join(format_event(e) for e in referenced)
+        return gemini_answer(question, context, history=list(session.turns))
+
     year = extract_year(q)
     month = extract_month(q)
 
@@ -99,29 +342,30 @@ def handle_user_query(question: str) -> str:
     if "free" in q:
         fee_filter = 0
 
+    # Count / calendar questions are answered exactly from the aggregates
+    aggregate_intent = extract_aggregate_intent(question.lower())
+    if aggregate_intent:
+        counts = retriever_module.get_event_counts(
+            group_by=aggregate_intent["group_by"],
+            filters=aggregate_intent["filters"],
+        )
+        if counts is not None:
+            # Counts aren't an event set; drop the previous one so "which
+            # ones were they?" doesn't resolve against an older search
+            if session is not None:
+                session.set_events([])
+            return format_event_counts(aggregate_intent, counts)
+
     event_name = extract_event_name(q)
     if event_name:
         event = retriever_module.get_event_by_name(normalize_text(event_name))
         if event:
-            details = [f"## {event.get('name_of_event','N/A')}"]
-            for k, label in [
-                ("date_of_event","Date"),
-                ("time_of_event","Time"),
-                ("venue","Venue"),
-                ("mode_of_event","Mode"),
-                ("registration_fee","Registration Fee"),
-                ("speakers","Speakers"),
-                ("faculty_coordinators","Faculty Coordinators"),
-                ("student_coordinators","Student Coordinators"),
-                ("perks","Perks"),
-                ("collaboration","Collaboration"),
-                ("description_insights","Description")
-            ]:
-                if event.get(k) is not None:
-                    details.append(f"**{label}:** {event[k]}")
-            return gemini_answer(question, "\n".join(details))
-
-    fuzzy_query = extract_keywords(q)
+            if session is not None:
+                session.set_events([project_event(event)])
+            return gemini_answer(question, format_event(event))
+
+    # Keywords for full-text search come from the un-collapsed question
+    fuzzy_query = extract_keywords(question.lower())
 
     results = retriever_module.hybrid_query(
         user_query=q,
@@ -132,29 +376,12 @@ def handle_user_query(question: str) -> str:
     )
 
     if not results:
+        if session is not None:
+            session.set_events([])
         return "I do not have enough information to answer that."
 
-    context_parts = []
-    for event in results:
-        details = [f"## {event.get('name_of_event','N/A')}"]
-        for k, label in [
-            ("date_of_event","Date"),
-            ("time_of_event","Time"),
-            ("venue","Venue"),
-            ("mode_of_event","Mode"),
-            ("registration_fee","Registration Fee"),
-            ("speakers","Speakers"),
-            ("faculty_coordinators","Faculty Coordinators"),
-            ("student_coordinators","Student Coordinators"),
-            ("perks","Perks"),
-            ("collaboration","Collaboration"),
-            ("description_insights","Description")
-        ]:
-            if event.get(k) is not None:
-                details.append(f"**{label}:** {event[k]}")
-        if "final_score" in event:
-            details.append(f"**Relevance Score:** {event['final_score']:.2f}")
-        context_parts.append("\n".join(details))
-
-    context = "\n\n---\n\n".join(context_parts)
+    if session is not None:
+        session.set_events([project_event(e) for e in results])
+
+    context = "\n\n---\n\n".join(format_event(e, include_score=True) for e in results)
     return gemini_answer(question, context)
@@ -1,5 +1,8 @@
 import os
 import re
+import json
+import base64
+from datetime import date
 from dotenv import load_dotenv
 from sqlalchemy import text
 from sentence_transformers import SentenceTransformer
@@ -19,36 +22,142 @@ def normalize_text(text: str) -> str:
     text = re.sub(r'(.)\1+', r'\1', text)
     return text
 
+def build_tsquery(text: str) -> str:
+    # OR the terms together so multi-word keyword strings still match events
+    # that only mention some of them; ts_rank_cd rewards covering more terms.
+    # Expects un-collapsed text: search_tsv is built from the raw columns, so
+    # normalize_text output ("quen", "metup") would never match.
+    # Single characters ("c++", "2.0") are dropped, and only terms of 3+
+    # characters get prefix matching so "ai" doesn't also match "aim".
+    terms = [t for t in re.findall(r"[a-z0-9]+", text.lower()) if len(t) >= 2]
+    return " | ".join(f"{t}:*" if len(t) >= 3 else t for t in terms)
+
+# Event name with repeated letters collapsed, mirroring normalize_text; the
+# trigram index in database.enable_full_text_search is on this expression.
+NAME_TRGM_EXPR = r"regexp_replace(LOWER(name_of_event), '(.)\1+', '\1', 'g')"
+
+def encode_query(user_query: str) -> str:
+    embedding = model.encode(user_query)
+    if isinstance(embedding, np.ndarray):
+        embedding = embedding.tolist()
+    return "[" + ",".join(map(str, embedding)) + "]"
+
+def fused_ranking_ctes(filter_clause: str, ts_query: str, trigram_query: str) -> str:
+    """
+    CTEs ranking the filtered events by full-text rank, by trigram
+    similarity to the event name (typo tolerance, "hakathon") and by vector
+    distance, fused into `fused(serial_no, final_score)` with weighted
+    reciprocal rank fusion. Expects the :ts_query, :trigram_query,
+    :user_vector, :vector_threshold, :candidate_limit, :rrf_k,
+    :lexical_weight, :trigram_weight and :vector_weight params, and
+    pg_trgm.word_similarity_threshold set via set_trigram_threshold.
+    """
+    if ts_query:
+        lexical_cte = f"""
+            SELECT
+                serial_no,
+                ROW_NUMBER() OVER (
+                    ORDER BY ts_rank_cd(search_tsv, query, 32) DESC, serial_no
+                ) AS rank
+            FROM events, to_tsquery('english', :ts_query) AS query
+            WHERE {filter_clause} AND search_tsv @@ query
+            ORDER BY rank
+            LIMIT :candidate_limit
+        """
+    else:
+        lexical_cte = "SELECT NULL::int AS serial_no, NULL::bigint AS rank WHERE FALSE"
+
+    if trigram_query:
+        trigram_cte = f"""
+            SELECT
+                serial_no,
+                ROW_NUMBER() OVER (
+                    ORDER BY word_similarity(:trigram_query, {NAME_TRGM_EXPR}) DESC, serial_no
+                ) AS rank
+            FROM events
+            WHERE {filter_clause} AND :trigram_query <% {NAME_TRGM_EXPR}
+            ORDER BY rank
+            LIMIT :candidate_limit
+        """
+    else:
+        trigram_cte = "SELECT NULL::int AS serial_no, NULL::bigint AS rank WHERE FALSE"
+
+    return f"""
+        WITH lexical AS ({lexical_cte}),
+        trigram AS ({trigram_cte}),
+        semantic AS (
+            SELECT
+                serial_no,
+                ROW_NUMBER() OVER (
+                    ORDER BY embedding <=> :user_vector, serial_no
+                ) AS rank
+            FROM events
+            WHERE {filter_clause}
+              AND embedding <=> :user_vector < :vector_threshold
+            ORDER BY rank
+            LIMIT :candidate_limit
+        ),
+        fused AS (
+            SELECT
+                COALESCE(l.serial_no, t.serial_no, s.serial_no) AS serial_no,
+                COALESCE(CAST(:lexical_weight AS float) / (:rrf_k + l.rank), 0)
+                + COALESCE(CAST(:trigram_weight AS float) / (:rrf_k + t.rank), 0)
+                + COALESCE(CAST(:vector_weight AS float) / (:rrf_k + s.rank), 0) AS final_score
+            FROM lexical l
+            FULL OUTER JOIN trigram t ON t.serial_no = l.serial_no
+            FULL OUTER JOIN semantic s ON s.serial_no = COALESCE(l.serial_no, t.serial_no)
+        )
+    """
+
+def set_trigram_threshold(conn, threshold: float):
+    # Transaction-local, so pooled connections don't keep the setting
+    conn.execute(
+        text("SELECT set_config('pg_trgm.word_similarity_threshold', :threshold, true)"),
+        {"threshold": str(threshold)},
+    )
+
 def hybrid_query(
     user_query: str,
     date_filter: Optional[str] = None,
     fee_filter: Optional[int] = None,
-    vector_weight: float = 0.4,
-    trigram_weight: float = 0.6,
+    vector_weight: float = 1.0,
+    lexical_weight: float = 1.0,
+    trigram_weight: float = 1.0,
+    rrf_k: int = 60,
     vector_threshold: float = 0.7,
+    trigram_threshold: float = 0.5,
+    candidate_limit: int = 100,
     limit: Optional[int] = 5,
     fuzzy_query: Optional[str] = None,
 ):
+    """
+    Rank events with full-text search, trigram name matching and vector
+    search separately, then combine the rankings with weighted reciprocal
+    rank fusion:
+
+        final_score = lexical_weight / (rrf_k + lexical_rank)
+                    + trigram_weight / (rrf_k + trigram_rank)
+                    + vector_weight / (rrf_k + vector_rank)
+    """
     try:
+        ts_query = build_tsquery(fuzzy_query or user_query)
+        trigram_query = normalize_text(fuzzy_query or user_query)
         user_query = normalize_text(user_query)
-        fuzzy_query = normalize_text(fuzzy_query) if fuzzy_query else user_query
-
-        embedding = model.encode(user_query)
-        if isinstance(embedding, np.ndarray):
-            embedding = embedding.tolist()
-
-        user_vector_str = "[" + ",".join(map(str, embedding)) + "]"
 
         with engine.connect() as conn:
-            conn.execute(text("SET pg_trgm.similarity_threshold = 0.15;"))
+            set_trigram_threshold(conn, trigram_threshold)
 
             sql_where_clauses = []
             sql_params = {
-                "user_query": fuzzy_query,
-                "user_vector": user_vector_str,
+                "ts_query": ts_query,
+                "trigram_query": trigram_query,
+                "user_vector": encode_query(user_query),
                 "vector_weight": vector_weight,
+                "lexical_weight": lexical_weight,
                 "trigram_weight": trigram_weight,
+                "rrf_k": rrf_k,
                 "vector_threshold": vector_threshold,
+                "candidate_limit": candidate_limit,
             }
 
             if date_filter:
@@ -63,41 +172,29 @@ def hybrid_query(
                 else:
                     sql_where_clauses.append(f"registration_fee <= {fee_filter}")
 
-            search_clause = """
-            (
-                similarity(:user_query, LOWER(search_text)) > 0.15
-                OR LOWER(search_text) ILIKE '%' || :user_query || '%'
-                OR embedding <=> :user_vector < :vector_threshold
-            )
-            """
-
-            sql_where_clauses.append(search_clause)
-
-            where_clause = "WHERE " + " AND ".join(sql_where_clauses)
+            filter_clause = " AND ".join(sql_where_clauses) or "TRUE"
             limit_clause = f"LIMIT {limit}" if limit else ""
 
             sql_query = f"""
+                {fused_ranking_ctes(filter_clause, ts_query, trigram_query)}
                 SELECT
-                    name_of_event,
-                    event_domain,
-                    date_of_event,
-                    time_of_event,
-                    venue,
-                    mode_of_event,
-                    registration_fee,
-                    speakers,
-                    faculty_coordinators,
-                    student_coordinators,
-                    perks,
-                    collaboration,
-                    description_insights,
-                    (
-                        (1 - (embedding <=> :user_vector)) * :vector_weight
-                        + similarity(:user_query, LOWER(search_text)) * :trigram_weight
-                    ) AS final_score
-                FROM events
-                {where_clause}
-                ORDER BY final_score DESC
+                    e.name_of_event,
+                    e.event_domain,
+                    e.date_of_event,
+                    e.time_of_event,
+                    e.venue,
+                    e.mode_of_event,
+                    e.registration_fee,
+                    e.speakers,
+                    e.faculty_coordinators,
+                    e.student_coordinators,
+                    e.perks,
+                    e.collaboration,
+                    e.description_insights,
+                    f.final_score
+                FROM fused f
+                JOIN events e ON e.serial_no = f.serial_no
+                ORDER BY f.final_score DESC
                 {limit_clause};
             """
 
@@ -110,6 +207,238 @@ def hybrid_query(
         print("Hybrid query error:", e)
         return []
 
+# Columns the browse API may return; embedding, search_text and search_tsv
+# are never projected.
+EVENT_FIELDS = (
+    "serial_no",
+    "name_of_event",
+    "event_domain",
+    "date_of_event",
+    "time_of_event",
+    "venue",
+    "mode_of_event",
+    "registration_fee",
+    "speakers",
+    "faculty_coordinators",
+    "student_coordinators",
+    "perks",
+    "collaboration",
+    "description_insights",
+)
+
+def encode_cursor(key: dict) -> str:
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> dict:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(key, dict) or not isinstance(key.get("id"), int):
+            raise ValueError
+        if "score" in key and (
+            isinstance(key["score"], bool) or not isinstance(key["score"], (int, float))
+        ):
+            raise ValueError
+        if "date" in key:
+            date.fromisoformat(key["date"])
+        return key
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+def search_events(
+    query: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    domain: Optional[str] = None,
+    max_fee: Optional[int] = None,
+    mode: Optional[str] = None,
+    fields: Optional[tuple] = None,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    vector_weight: float = 1.0,
+    lexical_weight: float = 1.0,
+    trigram_weight: float = 1.0,
+    rrf_k: int = 60,
+    vector_threshold: float = 0.7,
+    trigram_threshold: float = 0.5,
+    candidate_limit: int = 100,
+):
+    """
+    Structured event search for the browse API, with keyset pagination.
+
+    With a `query`, events are ranked like hybrid_query and paged on
+    (final_score, serial_no); without one they are listed newest first and
+    paged on (date_of_event, serial_no). Returns (rows, next_cursor).
+    Raises ValueError for unknown fields or a malformed cursor.
+    """
+    fields = tuple(fields) if fields else EVENT_FIELDS
+    for field in fields:
+        if field not in EVENT_FIELDS:
+            raise ValueError(f"Unknown field: {field}")
+    if "serial_no" not in fields:
+        fields = ("serial_no", *fields)
+    after = decode_cursor(cursor) if cursor else None
+    # Cursors are only valid for the mode that produced them
+    if after and ("score" if query else "date") not in after:
+        raise ValueError("Invalid cursor")
+
+    sql_where_clauses = []
+    sql_params = {"limit": limit + 1}
+
+    if date_from:
+        sql_where_clauses.append("date_of_event >= :date_from")
+        sql_params["date_from"] = date_from
+    if date_to:
+        sql_where_clauses.append("date_of_event <= :date_to")
+        sql_params["date_to"] = date_to
+    if domain:
+        sql_where_clauses.append(
+            "EXISTS (SELECT 1 FROM unnest(string_to_array(event_domain, '/')) AS d "
+            "WHERE LOWER(trim(d)) = LOWER(:domain))"
+        )
+        sql_params["domain"] = domain
+    if max_fee is not None:
+        sql_where_clauses.append("registration_fee <= :max_fee")
+        sql_params["max_fee"] = max_fee
+    if mode:
+        sql_where_clauses.append("LOWER(mode_of_event) = LOWER(:mode)")
+        sql_params["mode"] = mode
+
+    filter_clause = " AND ".join(sql_where_clauses) or "TRUE"
+    select_cols = ", ".join(f"e.{f}" for f in fields)
+
+    if query:
+        sql_params.update({
+            "ts_query": build_tsquery(query),
+            "trigram_query": normalize_text(query),
+            "user_vector": encode_query(normalize_text(query)),
+            "vector_weight": vector_weight,
+            "lexical_weight": lexical_weight,
+            "trigram_weight": trigram_weight,
+            "rrf_k": rrf_k,
+            "vector_threshold": vector_threshold,
+            "candidate_limit": candidate_limit,
+        })
+        keyset_clause = ""
+        if after:
+            keyset_clause = "WHERE (f.final_score, f.serial_no) < (:after_score, :after_id)"
+            sql_params["after_score"] = float(after["score"])
+            sql_params["after_id"] = after["id"]
+        sql_query = f"""
+            {fused_ranking_ctes(filter_clause, sql_params["ts_query"], sql_params["trigram_query"])}
+            SELECT {select_cols}, f.final_score AS score
+            FROM fused f
+            JOIN events e ON e.serial_no = f.serial_no
+            {keyset_clause}
+            ORDER BY f.final_score DESC, f.serial_no DESC
+            LIMIT :limit;
+        """
+    else:
+        # Served by idx_events_browse (database.enable_event_versioning)
+        sort_key = "COALESCE(e.date_of_event, DATE '0001-01-01')"
+        keyset_clause = ""
+        if after:
+            keyset_clause = f"AND ({sort_key}, e.serial_no) < (:after_date, :after_id)"
+            sql_params["after_date"] = date.fromisoformat(after["date"])
+            sql_params["after_id"] = after["id"]
+        sql_query = f"""
+            SELECT {select_cols}, {sort_key} AS sort_date
+            FROM events e
+            WHERE {filter_clause} {keyset_clause}
+            ORDER BY {sort_key} DESC, e.serial_no DESC
+            LIMIT :limit;
+        """
+
+    with engine.connect() as conn:
+        if query:
+            set_trigram_threshold(conn, trigram_threshold)
+        result = conn.execute(text(sql_query), sql_params)
+        rows = [dict(row) for row in result.mappings().fetchall()]
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        if query:
+            next_cursor = encode_cursor({"score": last["score"], "id": last["serial_no"]})
+        else:
+            next_cursor = encode_cursor({"date": last["sort_date"].isoformat(), "id": last["serial_no"]})
+    for row in rows:
+        row.pop("sort_date", None)
+
+    return rows, next_cursor
+
+def get_events_version():
+    """
+    (version, updated_at) of the last write to the events table, bumped by
+    the events_version trigger. Used for ETag / Last-Modified headers.
+    """
+    with engine.connect() as conn:
+        row = conn.execute(
+            text("SELECT version, updated_at FROM events_version WHERE id = 1")
+        ).first()
+    return (row[0], row[1]) if row else (0, None)
+
+STATS_DIMENSIONS = ("year", "month", "event_domain", "mode_of_event", "fee_tier")
+
+def get_event_counts(group_by: tuple = (), filters: Optional[dict] = None):
+    """
+    Exact event counts from the event_stats / event_domain_stats materialized
+    views. `group_by` and `filters` keys must be in STATS_DIMENSIONS; the
+    domain view is used whenever a domain is involved. Returns None if the
+    views are unavailable so callers can fall back to retrieval.
+    """
+    filters = filters or {}
+    try:
+        for dim in (*group_by, *filters):
+            if dim not in STATS_DIMENSIONS:
+                raise ValueError(f"Unknown stats dimension: {dim}")
+
+        view = (
+            "event_domain_stats"
+            if "event_domain" in group_by or "event_domain" in filters
+            else "event_stats"
+        )
+
+        sql_where_clauses = []
+        for dim in filters:
+            if dim in ("year", "month"):
+                sql_where_clauses.append(f"{dim} = :{dim}")
+            else:
+                sql_where_clauses.append(f"LOWER({dim}) = LOWER(:{dim})")
+
+        where_clause = "WHERE " + " AND ".join(sql_where_clauses) if sql_where_clauses else ""
+        select_cols = ", ".join([*group_by, "COALESCE(SUM(event_count), 0)::int AS event_count"])
+        group_clause = "GROUP BY " + ", ".join(group_by) if group_by else ""
+        if "year" in group_by or "month" in group_by:
+            order_clause = "ORDER BY " + ", ".join(group_by)
+        elif group_by:
+            order_clause = "ORDER BY event_count DESC"
+        else:
+            order_clause = ""
+
+        with engine.connect() as conn:
+            result = conn.execute(
+                text(f"SELECT {select_cols} FROM {view} {where_clause} {group_clause} {order_clause}"),
+                filters,
+            )
+            rows = result.mappings().fetchall()
+
+        return [dict(row) for row in rows]
+
+    except Exception as e:
+        print("Get event counts error:", e)
+        return None
+
+def get_event_domains():
+    try:
+        with engine.connect() as conn:
+            result = conn.execute(text("SELECT DISTINCT event_domain FROM event_domain_stats"))
+            return [row[0] for row in result.fetchall()]
+    except Exception as e:
+        print("Get event domains error:", e)
+        return []
+
 def get_event_by_name(event_name: str):
     try:
         event_name = normalize_text(event_name)
@@ -188,6 +517,8 @@ def add_new_event(form_data: dict):
                     "embedding": embedding,
                 },
             )
+            conn.execute(text("REFRESH MATERIALIZED VIEW event_stats"))
+            conn.execute(text("REFRESH MATERIALIZED VIEW event_domain_stats"))
 
         return {"status": "success"}
 
@@ -0,0 +1,165 @@
+import os
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Optional
+
+from sqlalchemy import text
+
+from database import engine
+
+# --- Config ---
+MAX_SESSIONS = 1000
+SESSION_TTL_SECONDS = 30 * 60
+MAX_TURNS = 6
+# "memory" keeps sessions in this process; "postgres" shares them across
+# workers (set by gunicorn.conf.py for multi-worker serving).
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory")
+
+
+class ChatSession:
+    """
+    Server-side state for one conversation: the last few question/answer
+    turns and the event set the latest retrieval returned, so follow-ups
+    can be answered without going back to the database.
+    """
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.turns = deque(maxlen=MAX_TURNS)
+        self.events = []
+        self.focus = None
+        self.last_access = time.monotonic()
+
+    def add_turn(self, question: str, answer: str):
+        self.turns.append((question, answer))
+
+    def set_events(self, events: list):
+        self.events = list(events)
+        self.focus = self.events[0] if len(self.events) == 1 else None
+
+    def to_json(self) -> str:
+        return json.dumps(
+            {"turns": list(self.turns), "events": self.events, "focus": self.focus},
+            default=str,
+        )
+
+    @classmethod
+    def from_json(cls, session_id: str, payload: dict) -> "ChatSession":
+        session = cls(session_id)
+        session.turns.extend(tuple(turn) for turn in payload.get("turns", []))
+        session.events = payload.get("events", [])
+        session.focus = payload.get("focus")
+        return session
+
+
+class SessionStore:
+    """
+    Bounded, TTL-evicted in-memory store. Least recently used sessions are
+    dropped once MAX_SESSIONS is reached; idle ones expire after the TTL.
+    """
+
+    def __init__(self, max_sessions: int = MAX_SESSIONS, ttl_seconds: float = SESSION_TTL_SECONDS):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _evict_expired(self, now: float):
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if now - session.last_access < self.ttl_seconds:
+                break
+            del self._sessions[session_id]
+
+    def get_or_create(self, session_id: Optional[str] = None) -> ChatSession:
+        # Unknown or expired ids get a fresh server-generated id rather than
+        # adopting the client's value.
+        now = time.monotonic()
+        with self._lock:
+            self._evict_expired(now)
+
+            session = self._sessions.get(session_id) if session_id else None
+            if session is None:
+                session = ChatSession(uuid.uuid4().hex)
+                self._sessions[session.session_id] = session
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+            else:
+                self._sessions.move_to_end(session.session_id)
+
+            session.last_access = now
+            return session
+
+    def save(self, session: ChatSession):
+        # Sessions are mutated in place, nothing to write back
+        pass
+
+
+class PostgresSessionStore:
+    """
+    Cross-worker store backed by the UNLOGGED chat_sessions table. Same
+    interface as SessionStore; callers must save() after mutating a session.
+    """
+
+    def __init__(self, max_sessions: int = MAX_SESSIONS, ttl_seconds: float = SESSION_TTL_SECONDS):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+
+    def get_or_create(self, session_id: Optional[str] = None) -> ChatSession:
+        params = {"ttl": self.ttl_seconds, "max_sessions": self.max_sessions}
+        with engine.begin() as conn:
+            if session_id:
+                row = conn.execute(
+                    text(
+                        """
+                        UPDATE chat_sessions SET last_access = now()
+                        WHERE session_id = :session_id
+                          AND last_access > now() - make_interval(secs => :ttl)
+                        RETURNING payload
+                        """
+                    ),
+                    {**params, "session_id": session_id},
+                ).first()
+                if row:
+                    return ChatSession.from_json(session_id, row[0])
+
+            session = ChatSession(uuid.uuid4().hex)
+            conn.execute(
+                text(
+                    "INSERT INTO chat_sessions (session_id, payload) "
+                    "VALUES (:session_id, CAST(:payload AS jsonb))"
+                ),
+                {"session_id": session.session_id, "payload": session.to_json()},
+            )
+            conn.execute(
+                text(
+                    """
+                    DELETE FROM chat_sessions
+                    WHERE last_access <= now() - make_interval(secs => :ttl)
+                       OR session_id IN (
+                           SELECT session_id FROM chat_sessions
+                           ORDER BY last_access DESC
+                           OFFSET :max_sessions
+                       )
+                    """
+                ),
+                params,
+            )
+            return session
+
+    def save(self, session: ChatSession):
+        with engine.begin() as conn:
+            conn.execute(
+                text(
+                    "UPDATE chat_sessions "
+                    "SET payload = CAST(:payload AS jsonb), last_access = now() "
+                    "WHERE session_id = :session_id"
+                ),
+                {"session_id": session.session_id, "payload": session.to_json()},
+            )
+
+
+store = PostgresSessionStore() if SESSION_BACKEND == "postgres" else SessionStore()
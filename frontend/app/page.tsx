@@ -8,6 +8,7 @@ export default function ChatPage() {
   const [query, setQuery] = useState("");
   const [answer, setAnswer] = useState("");
   const [loading, setLoading] = useState(false);
+  const [sessionId, setSessionId] = useState<string | null>(null);
 
   const handleSearch = async (e: FormEvent) => {
     e.preventDefault();
@@ -19,9 +20,10 @@ export default function ChatPage() {
     try {
       const res = await axios.post(
         `${process.env.NEXT_PUBLIC_API_URL}/api/chat`,
-        { query }
+        { query, session_id: sessionId }
       );
       setAnswer(res.data.answer);
+      setSessionId(res.data.session_id);
     } catch (error) {
       console.error(error);
       setAnswer("Error connecting to the agent.");